@@ -17,6 +17,7 @@ import re
 import warnings
 
 import numpy as np
+import scipy
 import scipy.special as sp
 from scipy.spatial import cKDTree
 from sklearn.metrics import pairwise_distances
@@ -24,6 +25,10 @@ from sklearn.neighbors import NearestNeighbors
 
 cores = multiprocessing.cpu_count()
 
+# cKDTree.query takes the number of threads as "workers" since scipy 1.6, and as "n_jobs" before
+_scipy_version = tuple(int(v) for v in re.findall(r"\d+", scipy.__version__)[:2])
+_ckdtree_jobs_kwarg = "workers" if _scipy_version >= (1, 6) else "n_jobs"
+
 
 def compute_all_distances(X, n_jobs=cores, metric="euclidean"):
     """Compute the distances among all available points of the dataset X
@@ -42,7 +47,7 @@ def compute_all_distances(X, n_jobs=cores, metric="euclidean"):
     return dists
 
 
-def compute_NN_PBC(X, maxk, box_size=None, p=2, cutoff=np.inf):
+def compute_NN_PBC(X, maxk, box_size=None, p=2, cutoff=np.inf, n_jobs=1):
     """Compute the neighbours of each point taking into account periodic boundaries conditions and eventual cutoff
 
     Args:
@@ -51,6 +56,7 @@ def compute_NN_PBC(X, maxk, box_size=None, p=2, cutoff=np.inf):
         box_size (float, np.ndarray(float)): sizes of PBC walls. Single value is interpreted as cubic box.
         p (int): Minkowski p-norm used
         cutoff (float): set an upper bound to the distances. Over such threshold a np.inf will occur
+        n_jobs (int): number of cores to use for the computation
 
     Returns:
         dist (np.ndarray(float)): N x maxk array containing the distances from each point to the first maxk nn
@@ -59,13 +65,18 @@ def compute_NN_PBC(X, maxk, box_size=None, p=2, cutoff=np.inf):
     """
 
     tree = cKDTree(X, boxsize=box_size)
-    dist, ind = tree.query(X, k=maxk, p=p, distance_upper_bound=cutoff)
+    dist, ind = tree.query(
+        X, k=maxk, p=p, distance_upper_bound=cutoff, **{_ckdtree_jobs_kwarg: n_jobs}
+    )
     return dist, ind
 
 
 def from_all_distances_to_nndistances(pdist_matrix, maxk):
     """Save the first maxk neighbours starting from the matrix of the distances
 
+    Neighbours at the same distance are ordered by increasing index, so that the result coincides with a
+    stable sort of each row; ties at the maxk-th neighbour keep the neighbours with the lowest indices.
+
     Args:
         pdist_matrix (np.ndarray(float)): N x N matrix of distances
         maxk (int): number of neighbours to save
@@ -76,12 +87,71 @@ def from_all_distances_to_nndistances(pdist_matrix, maxk):
 
     """
 
-    dist_indices = np.asarray(np.argsort(pdist_matrix, axis=1)[:, 0 : maxk + 1])
-    distances = np.asarray(np.take_along_axis(pdist_matrix, dist_indices, axis=1))
+    pdist_matrix = np.asarray(pdist_matrix)
+
+    small_int_matrix = _as_small_uint(pdist_matrix)
+    if small_int_matrix is not None:
+        # small non negative integer distances (e.g. hamming counts) are full of ties: a stable sort of
+        # 8 or 16 bit integers is a radix sort, cheaper than any partition of the original matrix
+        dist_indices = np.argsort(small_int_matrix, axis=1, kind="stable")
+        dist_indices = dist_indices[:, : maxk + 1]
+
+    elif maxk + 1 < pdist_matrix.shape[1]:
+        # only the first maxk + 1 neighbours are needed: partition each row and sort just those
+        dist_indices = np.argpartition(pdist_matrix, maxk, axis=1)[:, : maxk + 1]
+        kth = np.take_along_axis(pdist_matrix, dist_indices[:, maxk:], axis=1)
+
+        # in the rows with more neighbours at the (maxk + 1)-th distance than places left for them,
+        # keep the tied neighbours with the lowest indices
+        rows = np.flatnonzero(np.count_nonzero(pdist_matrix <= kth, axis=1) > maxk + 1)
+        if rows.size > 0:
+            row_indices = dist_indices[rows]
+            tied = pdist_matrix[rows] == kth[rows]
+            is_tied = np.take_along_axis(tied, row_indices, axis=1)
+            n_tied = np.count_nonzero(is_tied, axis=1).reshape(-1, 1)
+            tied &= np.cumsum(tied, axis=1, dtype=np.int32) <= n_tied
+            row_indices[is_tied] = np.nonzero(tied)[1]
+            dist_indices[rows] = row_indices
+
+        dist_indices = np.sort(dist_indices, axis=1)
+        distances = np.take_along_axis(pdist_matrix, dist_indices, axis=1)
+        order = np.argsort(distances, axis=1, kind="stable")
+        dist_indices = np.take_along_axis(dist_indices, order, axis=1)
+
+    else:
+        dist_indices = np.argsort(pdist_matrix, axis=1, kind="stable")[:, 0 : maxk + 1]
+
+    distances = np.take_along_axis(pdist_matrix, dist_indices, axis=1)
     return distances, dist_indices
 
 
-def compute_cross_nn_distances(X_new, X, maxk, metric="euclidean", period=None):
+def _as_small_uint(pdist_matrix):
+    """Return the distances as 8 or 16 bit unsigned integers if they are all such, None otherwise."""
+    if pdist_matrix.dtype.kind not in "uif" or pdist_matrix.size == 0:
+        return None
+
+    # most float matrices are rejected by their first row, without going through the whole matrix
+    if pdist_matrix.dtype.kind == "f" and not np.array_equal(
+        pdist_matrix[0], np.rint(pdist_matrix[0])
+    ):
+        return None
+
+    dist_min, dist_max = pdist_matrix.min(), pdist_matrix.max()
+    if not (dist_min >= 0 and dist_max < 2**16):
+        return None
+
+    small_int_matrix = pdist_matrix.astype(np.uint8 if dist_max < 2**8 else np.uint16)
+    if pdist_matrix.dtype.kind == "f" and not np.array_equal(
+        small_int_matrix, pdist_matrix
+    ):
+        return None
+
+    return small_int_matrix
+
+
+def compute_cross_nn_distances(
+    X_new, X, maxk, metric="euclidean", period=None, n_jobs=1
+):
     """Compute distances, up to neighbour maxk, between points of X_new and points of X.
 
     The element distances[i,j] represents the distance between point i in dataset X and its j-th neighbour in dataset
@@ -93,6 +163,7 @@ def compute_cross_nn_distances(X_new, X, maxk, metric="euclidean", period=None):
         maxk (int): number of neighbours to save
         metric (str): metric used to compute the distances
         period (float, np.ndarray(float)): sizes of PBC walls. Single value is interpreted as cubic box.
+        n_jobs (int): number of cores to use for the computation
 
     Returns:
         distances (np.ndarray(int)): N x maxk matrix, indices of the neighbours of each point
@@ -102,7 +173,7 @@ def compute_cross_nn_distances(X_new, X, maxk, metric="euclidean", period=None):
 
     if period is None:
         # nbrs = NearestNeighbors(n_neighbors=maxk, metric=metric, p=p).fit(X)
-        nbrs = NearestNeighbors(n_neighbors=maxk, metric=metric).fit(X)
+        nbrs = NearestNeighbors(n_neighbors=maxk, metric=metric, n_jobs=n_jobs).fit(X)
 
         distances, dist_indices = nbrs.kneighbors(X_new)
 
@@ -120,12 +191,14 @@ def compute_cross_nn_distances(X_new, X, maxk, metric="euclidean", period=None):
                 "periodic distance computation is supported only for euclidean and manhattan metrics"
             )
 
-        distances, dist_indices = compute_NN_PBC(X, maxk, box_size=period, p=p)
+        distances, dist_indices = compute_NN_PBC(
+            X, maxk, box_size=period, p=p, n_jobs=n_jobs
+        )
 
     return distances, dist_indices
 
 
-def compute_nn_distances(X, maxk, metric="euclidean", period=None):
+def compute_nn_distances(X, maxk, metric="euclidean", period=None, n_jobs=1):
     """For each point, compute the distances from its first maxk nearest neighbours
 
     Args:
@@ -133,6 +206,7 @@ def compute_nn_distances(X, maxk, metric="euclidean", period=None):
         maxk (int): number of neighbours to save
         metric (str): metric used to compute the distances
         period (float, np.ndarray(float)): sizes of PBC walls. Single value is interpreted as cubic box.
+        n_jobs (int): number of cores to use for the computation
 
     Returns:
         distances (np.ndarray(int)): N x maxk matrix, indices of the neighbours of each point
@@ -141,10 +215,12 @@ def compute_nn_distances(X, maxk, metric="euclidean", period=None):
     """
 
     distances, dist_indices = compute_cross_nn_distances(
-        X, X, maxk + 1, metric=metric, period=period
+        X, X, maxk + 1, metric=metric, period=period, n_jobs=n_jobs
     )
 
-    zero_dists = np.sum(distances[:, 1] <= 1.1 * np.finfo(distances.dtype).eps)
+    zero_dists = np.count_nonzero(
+        distances[:, 1] <= 1.1 * np.finfo(distances.dtype).eps
+    )
     if zero_dists > 0:
         warnings.warn(
             f"there may be data with zero distance from each other; this may compromise the correct behavior of some routines"
@@ -167,23 +243,45 @@ def _neg_loglik(dtype, d, mus, n1, n2):
     mus, n1, n2 = _filter_mus(dtype, mus, n1, n2)
 
     N = len(mus)
+    log_mus = np.log(mus)
     term1 = (N - 1) * np.log(d)
-    term2 = np.sum((n2 - n1 - 1) * np.log(mus**d - 1))
-    term3 = -np.sum(np.log(sp.beta(n2 - n1, n1)))
-    term4 = -np.sum((((n2 - 1) * d) + 1) * np.log(mus))
+    # log(mus**d - 1) and log(beta) are evaluated in log space to avoid overflows at large d and n2
+    term2 = np.sum((n2 - n1 - 1) * (d * log_mus + np.log(-np.expm1(-d * log_mus))))
+    term3 = -np.sum(sp.betaln(n2 - n1, n1))
+    term4 = -np.sum((((n2 - 1) * d) + 1) * log_mus)
 
     return -(term1 + term2 + term3 + term4)
 
 
-def _neg_dloglik_did(d, mus, n1, n2, N, eps):
-    """Compute the negative derivative of the log likelihood with respect to the id."""
-    one_m_mus_d = 1.0 - mus ** (-d)
+def _neg_dloglik_did(d, log_mus, n1, n2, N, eps):
+    """Compute the negative derivative of the log likelihood with respect to the id.
+
+    The logarithms of the mus are taken as input, so that they are computed only once per id search.
+    """
+    one_m_mus_d = -np.expm1(-d * log_mus)
     "regularize small numbers"
     one_m_mus_d[one_m_mus_d < 2 * eps] = 2 * eps
-    sum = np.sum(((1 - n2 + n1) / one_m_mus_d + n2 - 1.0) * np.log(mus))
+    sum = np.sum(((1 - n2 + n1) / one_m_mus_d + n2 - 1.0) * log_mus)
     return sum - (N - 1) / d
 
 
+def _neg_dloglik_did_and_d2(d, log_mus, n1, n2, N, eps):
+    """Compute the first and second derivatives of the negative log likelihood with respect to the id.
+
+    Both derivatives share the same evaluation of mus**(-d), so that a Newton step costs a single pass over the mus.
+    """
+    one_m_mus_d = -np.expm1(-d * log_mus)
+    mus_d = 1.0 - one_m_mus_d
+    "regularize small numbers"
+    one_m_mus_d[one_m_mus_d < 2 * eps] = 2 * eps
+    dl = np.sum(((1 - n2 + n1) / one_m_mus_d + n2 - 1.0) * log_mus) - (N - 1) / d
+    d2l = (
+        np.sum((n2 - n1 - 1) * log_mus**2 * mus_d / one_m_mus_d**2)
+        + (N - 1) / d**2
+    )
+    return dl, d2l
+
+
 def _filter_mus(dtype, mus, n1, n2):
     indx = np.nonzero(mus == 1)
     mus[indx] += 10 * np.finfo(dtype).eps
@@ -210,14 +308,24 @@ def _argmax_loglik(dtype, d0, d1, mus, n1, n2, eps=1.0e-7):
     mus, n1, n2 = _filter_mus(dtype, mus, n1, n2)
 
     N = len(mus)
-    l1 = _neg_dloglik_did(d1, mus, n1, n2, N, eps)
+    log_mus = np.log(mus)
+    l1 = _neg_dloglik_did(d1, log_mus, n1, n2, N, eps)
+    # safeguarded Newton: the root stays bracketed in [d0, d1] and
+    # a bisection step is taken whenever the Newton step leaves the bracket
+    d = (d0 + d1) / 2.0
     while abs(d0 - d1) > eps:
-        d2 = (d0 + d1) / 2.0
-        l2 = _neg_dloglik_did(d2, mus, n1, n2, N, eps)
+        l2, dl2 = _neg_dloglik_did_and_d2(d, log_mus, n1, n2, N, eps)
         if l2 * l1 > 0:
-            d1 = d2
+            d1 = d
         else:
-            d0 = d2
+            d0 = d
+        step = l2 / dl2
+        d_new = d - step
+        if not d0 < d_new < d1:
+            d_new = (d0 + d1) / 2.0
+        elif abs(step) < eps:
+            return d_new
+        d = d_new
     d = (d0 + d1) / 2.0
 
     return d
@@ -225,15 +333,15 @@ def _argmax_loglik(dtype, d0, d1, mus, n1, n2, eps=1.0e-7):
 
 def _fisher_info_scaling(id_ml, mus, n1, n2, eps):
     N = len(mus)
-    one_m_mus_d = 1.0 - mus ** (-id_ml)
+    log_mu = np.log(mus)
+    one_m_mus_d = -np.expm1(-id_ml * log_mu)
+    factor2 = 1.0 - one_m_mus_d
     "regularize small numbers"
     one_m_mus_d[one_m_mus_d < eps] = eps
-    log_mu = np.log(mus)
 
     j0 = N / id_ml**2
 
     factor1 = np.divide(log_mu, one_m_mus_d)
-    factor2 = mus ** (-id_ml)
     tmp = np.multiply(factor1**2, factor2)
     j1 = np.sum((n2 - n1 - 1) * tmp)
     return j0 + j1
@@ -360,24 +468,30 @@ def _beta_prior(k, n, r, a0=1, b0=1, posterior_profile=False):
     if posterior_profile:
         import matplotlib.pyplot as plt
 
+        abs_log_r = abs(np.log(r))
+
         def p_d(d):
-            return abs(posterior.pdf(r**d) * (r**d) * np.log(r))
+            r_d = r**d
+            P = posterior.pdf(r_d)
+            P *= r_d
+            P *= abs_log_r
+            return P
 
         dx = 0.1
         d_left = D_MIN
         d_right = D_MAX + dx + d_left
         d_range = np.arange(d_left, d_right, dx)
-        P = np.array([p_d(di) for di in d_range]) * dx
+        P = p_d(d_range) * dx
         mask = P != 0
-        elements = mask.sum()
+        elements = np.count_nonzero(mask)
         counter = 0
         # if less than 3 points !=0 are found, reduce the interval
         while elements < 3:
             dx /= 10
             d_range = np.arange(d_left, d_right, dx)
-            P = np.array([p_d(di) for di in d_range]) * dx
+            P = p_d(d_range) * dx
             mask = P != 0
-            elements = mask.sum()
+            elements = np.count_nonzero(mask)
             counter += 1
 
         # with more than 3 points !=0 we can restrict the domain and have a smooth distribution
@@ -387,7 +501,7 @@ def _beta_prior(k, n, r, a0=1, b0=1, posterior_profile=False):
         d_right = d_range[ind[-1]] + 0.5 * dx
         d_range = np.linspace(d_left, d_right, 1000)
         dx = d_range[1] - d_range[0]
-        P = np.array([p_d(di) for di in d_range]) * dx
+        P = p_d(d_range) * dx
 
         plt.plot(d_range, P)
         plt.xlabel("d")
@@ -189,7 +189,7 @@ class Base:
             print(f"Computation of the distances up to {self.maxk} NNs started")
 
         self.distances, self.dist_indices = compute_nn_distances(
-            self.X, self.maxk, self.metric, self.period
+            self.X, self.maxk, self.metric, self.period, n_jobs=self.njobs
         )
 
         sec2 = time.time()
@@ -98,14 +98,15 @@ class Data(Clustering, MetricComparisons):
         for i in range(n_iter):
             # compute kstar
             self.compute_kstar(Dthr)
-            print("iteration ", i)
-            print("id ", self.intrinsic_dim)
+            if self.verb:
+                print("iteration ", i)
+                print("id ", self.intrinsic_dim)
 
             # compute n2 and n1 via kstar. If not even, make it even by adding one
             n2s = self.kstar
             not_even = n2s % 2 != 0
             n2s[not_even] = n2s[not_even] + 1
-            assert sum(n2s % 2 != 0) == 0
+            assert np.count_nonzero(n2s % 2) == 0
             n1s = (n2s / 2).astype(int)
 
             # compute the mus
@@ -345,7 +345,7 @@ class DensityEstimation(IdEstimation):
             _ = self.compute_id_2NN()
 
         cross_distances, cross_dist_indices = compute_cross_nn_distances(
-            X_new, self.X, self.maxk, self.metric, self.period
+            X_new, self.X, self.maxk, self.metric, self.period, n_jobs=self.njobs
         )
 
         kstar = np.ones(X_new.shape[0], dtype=int) * k
@@ -378,7 +378,7 @@ class DensityEstimation(IdEstimation):
             _ = self.compute_id_2NN()
 
         cross_distances, cross_dist_indices = compute_cross_nn_distances(
-            X_new, self.X, self.maxk, self.metric, self.period
+            X_new, self.X, self.maxk, self.metric, self.period, n_jobs=self.njobs
         )
 
         kstar = cd._compute_kstar_interp(
@@ -419,7 +419,7 @@ class DensityEstimation(IdEstimation):
             _ = self.compute_id_2NN()
 
         cross_distances, cross_dist_indices = compute_cross_nn_distances(
-            X_new, self.X, self.maxk, self.metric, self.period
+            X_new, self.X, self.maxk, self.metric, self.period, n_jobs=self.njobs
         )
 
         kstar = cd._compute_kstar_interp(
@@ -170,7 +170,8 @@ class IdEstimation(Base):
         assert 0.0 < fraction and fraction <= 1.0, "'fraction' must be between 0 and 1"
         if fraction == 1.0 and algorithm == "base":
             algorithm = "ml"
-            print("fraction = 1: algorithm set to ml")
+            if self.verb:
+                print("fraction = 1: algorithm set to ml")
 
         nrep = int(np.rint(1.0 / decimation))
         ids = np.zeros(nrep)
@@ -199,6 +200,7 @@ class IdEstimation(Base):
                     maxk=3,  # only compute first 2 nn
                     metric=self.metric,
                     period=self.period,
+                    n_jobs=self.njobs,
                 )
 
             mus[:, j] = distances[:, 2] / distances[:, 1]
@@ -517,7 +519,7 @@ class IdEstimation(Base):
 
         neigh_dist, neigh_ind, mus, rs = zip(*chunked_results)
 
-        zero_dists = np.sum(
+        zero_dists = np.count_nonzero(
             neigh_dist[0][:, 1] <= 1.1 * np.finfo(neigh_dist[0].dtype).eps
         )
         if zero_dists > 0:
@@ -610,7 +612,8 @@ class IdEstimation(Base):
         # routine
         rn = rk * r
         k = (self.distances <= rk).sum(axis=1)
-        n = (self.distances <= rn).sum(axis=1)
+        # rows are sorted and rn < rk, so the inner shell is contained in the first k.max() columns
+        n = (self.distances[:, : k.max()] <= rn).sum(axis=1)
 
         # checks-out
         if self.maxk == self.N - 1:
@@ -625,7 +628,7 @@ class IdEstimation(Base):
             if np.any(~mask):
                 print(
                     "NB: for "
-                    + str(sum(~(mask)))
+                    + str(np.count_nonzero(~mask))
                     + " points, the counting of k_binomial could be wrong, "
                     + "as more points might be present within the selected radius with respect "
                     "to the calculated neighbours. In order not to affect "
@@ -727,7 +730,14 @@ class IdEstimation(Base):
         # routine
         rk = self.distances[:, k]
         rn = rk * r
-        n = (self.distances <= rn.reshape(self.N, 1)).sum(axis=1)
+        # rows are sorted, so where rn < rk only the first k neighbours can fall within rn
+        n = (self.distances[:, : k + 1] <= rn.reshape(self.N, 1)).sum(axis=1)
+        # where rn == rk (rk == 0 with duplicate points) neighbours beyond k may also be
+        # within rn: count them on the full row
+        full_row = rn >= rk
+        if np.any(full_row):
+            rn_full = rn[full_row].reshape(-1, 1)
+            n[full_row] = (self.distances[full_row] <= rn_full).sum(axis=1)
 
         self.intrinsic_dim_scale = 0.5 * (rk.mean() + rn.mean())
 
@@ -65,25 +65,29 @@ class MetricComparisons(Base):
             njobs=njobs,
         )
 
-    def return_inf_imb_two_selected_coords(self, coords1, coords2, k=1):
+    def return_inf_imb_two_selected_coords(self, coords1, coords2, k=1, n_jobs=None):
         """Return the imbalances between distances taken as the i and the j component of the coordinate matrix X.
 
         Args:
             coords1 (list(int)): components for the first distance
             coords2 (list(int)): components for the second distance
             k (int): order of nearest neighbour considered for the calculation of the imbalance, default is 1
+            n_jobs (int): number of cores used for the neighbour searches, default is self.njobs
 
         Returns:
             (float, float): the information imbalance from distance i to distance j and vice versa
         """
+        if n_jobs is None:
+            n_jobs = self.njobs
+
         X_ = self.X[:, coords1]
         _, dist_indices_i = compute_nn_distances(
-            X_, self.maxk, self.metric, self.period
+            X_, self.maxk, self.metric, self.period, n_jobs=n_jobs
         )
 
         X_ = self.X[:, coords2]
         _, dist_indices_j = compute_nn_distances(
-            X_, self.maxk, self.metric, self.period
+            X_, self.maxk, self.metric, self.period, n_jobs=n_jobs
         )
 
         imb_ij = _return_imbalance(dist_indices_i, dist_indices_j, k=k)
@@ -113,8 +117,9 @@ class MetricComparisons(Base):
                 )
             )
 
+        # the pairs are spread over the joblib workers, so each neighbour search runs on a single core
         nmats = Parallel(n_jobs=self.njobs)(
-            delayed(self.return_inf_imb_two_selected_coords)([i], [j], k)
+            delayed(self.return_inf_imb_two_selected_coords)([i], [j], k, n_jobs=1)
             for i in range(ncoords)
             for j in range(i)
         )
@@ -258,8 +263,9 @@ class MetricComparisons(Base):
         else:
             period_ = self.period
 
+        # this method runs inside joblib workers, so the neighbour search is kept single-threaded
         _, dist_indices_coords = compute_nn_distances(
-            X_, self.maxk, self.metric, period_
+            X_, self.maxk, self.metric, period_, n_jobs=1
         )
 
         imb_coords_full = _return_imbalance(dist_indices_coords, dist_indices, k=k)
@@ -505,7 +511,7 @@ class MetricComparisons(Base):
         if distances is None:
             assert coordinates is not None
             _, dist_indices = compute_nn_distances(
-                coordinates, self.maxk, self.metric, self.period
+                coordinates, self.maxk, self.metric, self.period, n_jobs=self.njobs
             )
         else:
             distances, dist_indices, N, maxk = self._init_distances(
@@ -551,12 +557,13 @@ class MetricComparisons(Base):
 
         X_ = self.X[:, coords]
 
-        _, dist_indices_ = compute_nn_distances(X_, self.maxk, self.metric, self.period)
+        _, dist_indices_ = compute_nn_distances(
+            X_, self.maxk, self.metric, self.period, n_jobs=self.njobs
+        )
 
-        overlaps = []
-        for i in range(self.N):
-            neigh_idx_i = dist_indices_[i, 1 : k + 1]
-            overlaps.append(sum(labels[neigh_idx_i] == labels[i]) / k)
+        labels = np.asarray(labels)
+        neighbor_index = dist_indices_[:, 1 : k + 1]
+        overlaps = np.equal(labels[neighbor_index], labels[:, np.newaxis])
 
         overlap = np.mean(overlaps)
 
@@ -580,8 +587,12 @@ class MetricComparisons(Base):
         X1_ = self.X[:, coords1]
         X2_ = self.X[:, coords2]
 
-        _, dist_indices1_ = compute_nn_distances(X1_, k + 2, self.metric, self.period)
-        _, dist_indices2_ = compute_nn_distances(X2_, k + 2, self.metric, self.period)
+        _, dist_indices1_ = compute_nn_distances(
+            X1_, k + 2, self.metric, self.period, n_jobs=self.njobs
+        )
+        _, dist_indices2_ = compute_nn_distances(
+            X2_, k + 2, self.metric, self.period, n_jobs=self.njobs
+        )
 
         overlap = np.mean(dist_indices1_[:, 1 : k + 1] == dist_indices2_[:, 1 : k + 1])
 
@@ -16,6 +16,7 @@
 """Module for testing class initialisation with distance matrices."""
 
 import numpy as np
+import pytest
 from sklearn.metrics import pairwise_distances
 
 from dadapy import Base
@@ -34,3 +35,30 @@ def test_distance_initialization():
 
     assert (d.distances == expected_dists).all()
     assert (d.dist_indices == expected_indices).all()
+
+
+@pytest.mark.parametrize("scale", [1, 1.0, 0.3])
+def test_distance_initialization_with_ties(scale):
+    """Test that tied distances are ordered by neighbour index."""
+    rng = np.random.default_rng(0)
+    dists = rng.integers(1, 4, size=(60, 60))
+    dists = (dists + dists.T) * scale
+    np.fill_diagonal(dists, 0)
+
+    for maxk in [1, 5, 20, 59]:
+        d = Base(distances=dists, maxk=maxk)
+
+        expected_indices = np.argsort(dists, axis=1, kind="stable")[:, : maxk + 1]
+
+        assert (d.dist_indices == expected_indices).all()
+        assert (d.distances == np.take_along_axis(dists, expected_indices, 1)).all()
+        assert d.distances.dtype == dists.dtype
+
+
+def test_distance_initialization_with_ties_on_a_line():
+    """Test the order of tied neighbours of points on a line."""
+    # points on a line at integer positions: the two neighbours at distance 1 are tied
+    X = np.arange(5, dtype=float).reshape(-1, 1)
+    d = Base(distances=pairwise_distances(X), maxk=1)
+
+    assert (d.dist_indices == np.array([[0, 1], [1, 0], [2, 1], [3, 2], [4, 3]])).all()
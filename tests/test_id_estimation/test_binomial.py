@@ -39,3 +39,22 @@ def test_compute_id_2NN():
 
     id_b = ie.compute_id_binomial_k(5, 0.5)
     assert id_b == pytest.approx([1.98391, 0.123781, 0.56159], abs=1e-4, rel=1e-2)
+
+
+def test_fix_k_with_duplicates():
+    """Test that inner-shell counts include all zero-distance neighbours when rk is zero."""
+    rng = np.random.default_rng(0)
+    X_dup = np.vstack(
+        [rng.normal(size=(200, 2)), np.tile(rng.normal(size=(5, 2)), (8, 1))]
+    )
+
+    ie = IdEstimation(coordinates=X_dup, maxk=20)
+    ie.compute_distances()
+
+    k, r = 5, 0.5
+    n = ie._fix_k(k, r)
+
+    rn = ie.distances[:, k] * r
+    n_full = (ie.distances <= rn.reshape(-1, 1)).sum(axis=1)
+    assert np.any(ie.distances[:, k] == 0)
+    assert (n == n_full).all()
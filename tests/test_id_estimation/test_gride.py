@@ -19,8 +19,10 @@ import os
 
 import numpy as np
 import pytest
+import scipy.special as sp
 
 from dadapy import IdEstimation
+from dadapy._utils import utils as ut
 
 
 def test_compute_id_gride():
@@ -54,3 +56,87 @@ def test_zero_dist():
 
     with pytest.warns(UserWarning):
         de.return_id_scaling_gride()
+
+
+def _bisection_argmax_loglik(d0, d1, mus, n1, n2, eps=1.0e-7):
+    """Reference gride id search by plain bisection of the likelihood derivative."""
+    log_mus = np.log(mus)
+    N = len(mus)
+    l1 = ut._neg_dloglik_did(d1, log_mus, n1, n2, N, eps)
+    while abs(d0 - d1) > eps:
+        d2 = (d0 + d1) / 2.0
+        l2 = ut._neg_dloglik_did(d2, log_mus, n1, n2, N, eps)
+        if l2 * l1 > 0:
+            d1 = d2
+        else:
+            d0 = d2
+    return (d0 + d1) / 2.0
+
+
+@pytest.mark.parametrize("n1", [1, 4, 32])
+@pytest.mark.parametrize("d", [0.5, 2.0, 8.0])
+def test_neg_dloglik_second_derivative(n1, d):
+    """Test the analytic second derivative of the gride likelihood against finite differences."""
+    rng = np.random.default_rng(0)
+    mus = (1 - rng.random(500)) ** (-1.0 / 3.0)
+    log_mus = np.log(mus)
+    N, n2, eps = len(mus), 2 * n1, 1e-7
+
+    dl, d2l = ut._neg_dloglik_did_and_d2(d, log_mus, n1, n2, N, eps)
+    assert dl == pytest.approx(ut._neg_dloglik_did(d, log_mus, n1, n2, N, eps))
+
+    h = 1e-5 * d
+    d2l_fd = (
+        ut._neg_dloglik_did(d + h, log_mus, n1, n2, N, eps)
+        - ut._neg_dloglik_did(d - h, log_mus, n1, n2, N, eps)
+    ) / (2 * h)
+    assert d2l == pytest.approx(d2l_fd, rel=1e-5)
+
+
+@pytest.mark.parametrize("n1", [1, 2, 8, 64])
+@pytest.mark.parametrize("id_true", [1.0, 3.0, 10.0])
+def test_argmax_loglik_matches_bisection(n1, id_true):
+    """Test that the Newton id search of gride agrees with a plain bisection."""
+    rng = np.random.default_rng(int(10 * id_true) + n1)
+    n2 = 2 * n1
+    # mus of the gride model: mu**(-d) is Beta(n1, n2 - n1) distributed
+    mus = rng.beta(n1, n2 - n1, size=2000) ** (-1.0 / id_true)
+
+    mus_ref, n1_ref, n2_ref = ut._filter_mus(np.float64, mus.copy(), n1, n2)
+    d_ref = _bisection_argmax_loglik(0.001, 1000, mus_ref, n1_ref, n2_ref)
+    d_new = ut._argmax_loglik(np.float64, 0.001, 1000, mus.copy(), n1, n2)
+
+    assert d_new == pytest.approx(d_ref, abs=1e-6)
+
+
+def _neg_loglik_direct(d, mus, n1, n2):
+    """Reference gride negative log likelihood, evaluated without log-space rewriting."""
+    N = len(mus)
+    term1 = (N - 1) * np.log(d)
+    term2 = np.sum((n2 - n1 - 1) * np.log(mus**d - 1))
+    term3 = -np.sum(np.log(sp.beta(n2 - n1, n1)))
+    term4 = -np.sum((((n2 - 1) * d) + 1) * np.log(mus))
+    return -(term1 + term2 + term3 + term4)
+
+
+@pytest.mark.parametrize("n1", [1, 4, 32, 1024])
+def test_neg_loglik_large_n1(n1):
+    """Test that the gride likelihood stays finite at large n1 and matches the direct formula."""
+    rng = np.random.default_rng(n1)
+    n2 = 2 * n1
+    mus = rng.beta(n1, n2 - n1, size=1000) ** (-1.0 / 5.0)
+
+    for d in [1.0, 5.0, 20.0]:
+        value = ut._neg_loglik(np.float64, d, mus.copy(), n1, n2)
+        assert np.isfinite(value)
+
+        mus_ref, n1_ref, n2_ref = ut._filter_mus(np.float64, mus.copy(), n1, n2)
+        with np.errstate(over="ignore", divide="ignore", invalid="ignore"):
+            reference = _neg_loglik_direct(d, mus_ref, n1_ref, n2_ref)
+        if np.isfinite(reference):
+            assert value == pytest.approx(reference, rel=1e-8)
+
+    # the direct formula underflows in beta(n2 - n1, n1) here, the log-space one does not
+    if n1 == 1024:
+        with np.errstate(divide="ignore"):
+            assert not np.isfinite(_neg_loglik_direct(5.0, mus, n1, n2))
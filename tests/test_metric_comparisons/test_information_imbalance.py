@@ -101,3 +101,15 @@ def test_return_inf_imb_two_selected_coords():
     imbalances = mc.return_inf_imb_two_selected_coords([0], [0, 1])
 
     assert imbalances == pytest.approx([0.598, 0.144], abs=0.001)
+
+
+def test_return_inf_imb_two_selected_coords_n_jobs():
+    """Test that the imbalances between selected coordinates do not depend on the number of cores."""
+    X = np.load(filename)
+
+    mc = MetricComparisons(coordinates=X, maxk=X.shape[0] - 1, njobs=2)
+
+    imbalances = mc.return_inf_imb_two_selected_coords([0], [0, 1])
+    imbalances_1 = mc.return_inf_imb_two_selected_coords([0], [0, 1], n_jobs=1)
+
+    assert imbalances == pytest.approx(imbalances_1)
@@ -27,3 +27,27 @@ def test_zero_dist():
     X = np.array([[0.0, 0.0, 0.0], [0.0, 0.0, 0.0], [0.9, 0.0, 0.0]])
     with pytest.warns(UserWarning):
         utils.compute_nn_distances(X, maxk=2, metric="euclidean", period=None)
+
+
+@pytest.mark.parametrize("period", [None, 1.0])
+def test_nn_distances_n_jobs(period):
+    """Test that the nearest neighbours do not depend on the number of jobs used."""
+    rng = np.random.default_rng(0)
+    X = rng.random(size=(300, 3))
+
+    dist_1, ind_1 = utils.compute_nn_distances(X, maxk=10, period=period, n_jobs=1)
+    dist_2, ind_2 = utils.compute_nn_distances(X, maxk=10, period=period, n_jobs=2)
+
+    assert dist_1 == pytest.approx(dist_2)
+    assert (ind_1 == ind_2).all()
+
+    X_new = rng.random(size=(50, 3))
+    dist_1, ind_1 = utils.compute_cross_nn_distances(
+        X_new, X, maxk=10, period=period, n_jobs=1
+    )
+    dist_2, ind_2 = utils.compute_cross_nn_distances(
+        X_new, X, maxk=10, period=period, n_jobs=-1
+    )
+
+    assert dist_1 == pytest.approx(dist_2)
+    assert (ind_1 == ind_2).all()